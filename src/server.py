@@ -1,18 +1,43 @@
 from mcp.server.fastmcp import FastMCP
-import json
+import atexit
+from array import array
+import logging
+import math
+import mmap
 import os
+import signal
+import sys
+import threading
+import time
+import orjson
+from pathlib import Path
 from typing import List, Optional
-from pydantic import BaseModel, EmailStr, Field
+from pydantic import BaseModel, EmailStr, Field, ValidationError
 
 # --- Dynamic Path Configuration ---
-# Use /tmp for cloud environments (like watsonx) to bypass Permission Errors.
+# Set EMPLOYEE_DB to choose the file explicitly.
+# Otherwise use /tmp for cloud environments (like watsonx) to bypass Permission Errors.
 # On your MacBook, it will default to your Documents folder.
-if os.name == 'posix' and not os.path.exists(os.path.expanduser("~/Documents")):
-    JSON_FILE_PATH = "/tmp/employee_data.json"
+# Employees are stored as JSON Lines (one record per line) so inserts can append.
+# The location is resolved once at import and reused as-is by every helper.
+# os.path.expanduser (unlike Path.home) leaves "~" in place when there is no home
+# directory, so that case falls through to /tmp instead of raising.
+if os.environ.get("EMPLOYEE_DB"):
+    _PATH = Path(os.path.expanduser(os.environ["EMPLOYEE_DB"])).resolve()
 else:
-    JSON_FILE_PATH = os.path.expanduser("~/Documents/employee_data.json")
+    _DOCUMENTS = os.path.expanduser("~/Documents")
+    if os.name == 'posix' and not os.path.exists(_DOCUMENTS):
+        _PATH = Path("/tmp/employee_data.jsonl")
+    else:
+        _PATH = Path(_DOCUMENTS, "employee_data.jsonl")
+_PATH_STR = str(_PATH)
+_PATH_PARENT = _PATH.parent
+_TMP_PATH_STR = _PATH_STR + ".tmp"
+# Single JSON array file used before the switch to JSON Lines; migrated on startup.
+_LEGACY_PATH_STR = str(_PATH.with_suffix(".json"))
 
 mcp = FastMCP("Employee")
+logger = logging.getLogger(__name__)
 
 # --- Pydantic Models ---
 class Employee(BaseModel):
@@ -20,100 +45,497 @@ class Employee(BaseModel):
     name: str = Field(..., min_length=1, description="Employee's full name")
     job_role: str = Field(..., min_length=1, description="Employee's job role")
     department: str = Field(..., min_length=1, description="Employee's department")
-    salary: float = Field(..., gt=0, description="Employee's salary")
+    salary: float = Field(..., gt=0, allow_inf_nan=False, description="Employee's salary")
+
+def _validation_error(exc: ValidationError) -> str:
+    details = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in exc.errors())
+    return f"Error: {details}."
+
+# --- In-memory cache ---
+# Employees stored column-wise (one array/list per field), loaded once and reloaded
+# only when the file's mtime or size changes. _ROW maps an employee ID to its row.
+# Deleted rows are tombstoned (dropped from _ROW, zeroed in _ALIVE) and compacted
+# away, in order, before anything reads the whole table.
+_IDS = array('q')
+_NAMES: List[str] = []
+_ROLES: List[str] = []
+_DEPTS: List[str] = []
+_SALARIES = array('d')
+_ROW: dict[int, int] = {}
+_ALIVE = bytearray()
+_dead_rows = 0
+_COLUMNS = {"name": _NAMES, "job_role": _ROLES, "department": _DEPTS, "salary": _SALARIES}
+_CACHE_STAT: Optional[tuple[int, int]] = None
+_CACHE_LOADED = False
+_NEXT_ID = 1
+# Rendered list_employees / get_employee_ids responses, rebuilt lazily after the table changes.
+_LIST_JSON: Optional[str] = None
+_IDS_STR: Optional[str] = None
+# Set when the file on disk cannot be parsed at all; tools return it instead of
+# touching the table, so the unreadable file is never overwritten.
+_LOAD_ERROR: Optional[str] = None
+
+# --- Deferred writes ---
+# Mutations mark the cache dirty; bursts are coalesced into one write after
+# _FLUSH_DELAY seconds of quiet, or immediately every _FLUSH_EVERY mutations.
+# Pure inserts are appended to the file; anything else rewrites it.
+_FLUSH_DELAY = 0.05
+_FLUSH_EVERY = 100
+# Guards the table and the flush state. Mutators and reloads hold it for their whole
+# read-modify-persist sequence; cached responses are returned without it.
+_LOCK = threading.RLock()
+_dirty = False
+_needs_rewrite = False
+_pending_appends: List[dict] = []
+_pending_writes = 0
+# One daemon thread performs deferred flushes; _persist pushes _flush_deadline back
+# and wakes it only when no flush was pending.
+_flush_wakeup = threading.Condition(_LOCK)
+_flush_deadline: Optional[float] = None
+_flusher: Optional[threading.Thread] = None
 
 # --- Helper functions for File I/O ---
+def _parse_array(buf: bytes, path: str) -> List[dict]:
+    """Parse the legacy single JSON array format, raising ValueError if it is unreadable."""
+    try:
+        data = orjson.loads(buf)
+    except orjson.JSONDecodeError:
+        data = None
+    if not isinstance(data, list):
+        raise ValueError(f"could not parse {path}")
+    return [record for record in data if isinstance(record, dict)]
+
+def _load_file() -> tuple[List[dict], bool, bool]:
+    """Parse the employee file.
+
+    Returns the records, whether every line was intact, and whether the file was
+    still a legacy JSON array. Raises ValueError if no part of the file parses.
+    """
+    try:
+        fd = os.open(_PATH_STR, os.O_RDONLY)
+    except FileNotFoundError:
+        return [], True, False
+    records = []
+    try:
+        # mmap cannot map an empty file.
+        if os.fstat(fd).st_size == 0:
+            return records, True, False
+        # Map the file rather than reading it into one bytes object; lines are
+        # sliced out of the page cache as they are parsed.
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm:
+            intact = mm[-1:] == b"\n"
+            first_line = True
+            for line in iter(mm.readline, b""):
+                if not line.strip():
+                    continue
+                if first_line and line.lstrip().startswith(b"["):
+                    # A whole-file array, e.g. EMPLOYEE_DB pointed at an old .json file.
+                    return _parse_array(mm[:], _PATH_STR), True, True
+                first_line = False
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError:
+                    # Typically a torn final line from an interrupted append.
+                    intact = False
+                    continue
+                if isinstance(record, dict):
+                    records.append(record)
+    finally:
+        os.close(fd)
+    if not records and not intact:
+        raise ValueError(f"could not parse {_PATH_STR}")
+    return records, intact, False
+
+def _load_legacy_file() -> Optional[List[dict]]:
+    """Parse the pre-JSON Lines array file, or return None if there is none."""
+    try:
+        with open(_LEGACY_PATH_STR, 'rb', buffering=0) as f:
+            buf = f.read()
+    except FileNotFoundError:
+        return None
+    return _parse_array(buf, _LEGACY_PATH_STR)
+
+def _file_stat() -> Optional[tuple[int, int]]:
+    try:
+        st = os.stat(_PATH_STR)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def _refresh_cache() -> Optional[str]:
+    """Reload the cache from disk if the file changed since the last load.
+
+    Returns an error message if the file could not be parsed.
+    """
+    # Unflushed changes take precedence over whatever is on disk.
+    if _CACHE_LOADED and _dirty:
+        return _LOAD_ERROR
+    stat = _file_stat()
+    if _CACHE_LOADED and stat == _CACHE_STAT:
+        return _LOAD_ERROR
+    with _LOCK:
+        # Another caller may have reloaded, or started mutating, while we waited.
+        stat = _file_stat()
+        if not (_CACHE_LOADED and (_dirty or stat == _CACHE_STAT)):
+            _reload_cache(stat)
+        return _LOAD_ERROR
+
+def _reload_cache(stat: Optional[tuple[int, int]]):
+    global _CACHE_STAT, _CACHE_LOADED, _NEXT_ID, _needs_rewrite, _LOAD_ERROR, _dead_rows
+    try:
+        if not _CACHE_LOADED and stat is None:
+            # First load with no JSON Lines file yet: carry over a legacy .json file.
+            # Done here rather than in main() so `mcp run` / `mcp dev` migrate too.
+            legacy = _load_legacy_file()
+            if legacy is not None:
+                write_db(legacy)
+                stat = _file_stat()
+        records, intact, is_array = _load_file()
+    except ValueError as exc:
+        _LOAD_ERROR = f"Error: {exc}; fix or remove the file before using the employee tools."
+        records, intact, is_array = [], True, False
+    else:
+        _LOAD_ERROR = None
+    for column in (_IDS, _NAMES, _ROLES, _DEPTS, _SALARIES, _ALIVE):
+        del column[:]
+    _ROW.clear()
+    _dead_rows = 0
+    for emp in records:
+        try:
+            emp = Employee.model_validate(emp).model_dump()
+        except ValidationError:
+            # Skip records the tools would have rejected; the next flush drops them.
+            intact = False
+            continue
+        row = _ROW.get(emp["id"])
+        if row is None:
+            _append_row(emp)
+        else:
+            # A later duplicate wins but keeps the first occurrence's position.
+            _set_row(row, emp)
+    # Never append after a damaged line; the next flush rewrites the file instead.
+    _needs_rewrite = not intact
+    if is_array:
+        # Convert a legacy array file in place so later inserts can append to it.
+        write_db(_rows())
+        stat = _file_stat()
+    _NEXT_ID = max(_IDS, default=0) + 1
+    _CACHE_STAT = stat
+    # After a failed load every call retries, so fixing or removing the bad file
+    # (including a legacy .json, which leaves no stat to compare) takes effect.
+    _CACHE_LOADED = _LOAD_ERROR is None
+    _invalidate_views()
+
+def _append_row(emp: dict):
+    _ROW[emp["id"]] = len(_IDS)
+    _IDS.append(emp["id"])
+    _NAMES.append(emp["name"])
+    # Roles and departments repeat across employees; interning shares one str per value.
+    _ROLES.append(sys.intern(emp["job_role"]))
+    _DEPTS.append(sys.intern(emp["department"]))
+    _SALARIES.append(emp["salary"])
+    _ALIVE.append(1)
+
+def _set_row(row: int, emp: dict):
+    _NAMES[row] = emp["name"]
+    _ROLES[row] = sys.intern(emp["job_role"])
+    _DEPTS[row] = sys.intern(emp["department"])
+    _SALARIES[row] = emp["salary"]
+
+def _delete_row(row: int):
+    global _dead_rows
+    del _ROW[_IDS[row]]
+    _ALIVE[row] = 0
+    _dead_rows += 1
+
+def _compact():
+    """Drop tombstoned rows, keeping the remaining rows in order."""
+    global _dead_rows
+    if not _dead_rows:
+        return
+    keep = [row for row, alive in enumerate(_ALIVE) if alive]
+    for column in (_NAMES, _ROLES, _DEPTS):
+        column[:] = [column[row] for row in keep]
+    for column in (_IDS, _SALARIES):
+        column[:] = array(column.typecode, [column[row] for row in keep])
+    _ALIVE[:] = b"\x01" * len(keep)
+    _ROW.clear()
+    _ROW.update(zip(_IDS, range(len(_IDS))))
+    _dead_rows = 0
+
+def _row(row: int) -> dict:
+    return {
+        "id": _IDS[row], "name": _NAMES[row], "job_role": _ROLES[row],
+        "department": _DEPTS[row], "salary": _SALARIES[row]
+    }
+
+def _rows() -> List[dict]:
+    _compact()
+    return [
+        {"id": emp_id, "name": name, "job_role": role, "department": dept, "salary": salary}
+        for emp_id, name, role, dept, salary in zip(_IDS, _NAMES, _ROLES, _DEPTS, _SALARIES)
+    ]
+
+def _invalidate_views():
+    global _LIST_JSON, _IDS_STR
+    _LIST_JSON = None
+    _IDS_STR = None
+
 def read_db() -> List[dict]:
-    if not os.path.exists(JSON_FILE_PATH):
-        return []
+    _refresh_cache()
+    with _LOCK:
+        return _rows()
+
+def _encode_lines(data: List[dict]) -> bytes:
+    return b"".join(orjson.dumps(emp, option=orjson.OPT_APPEND_NEWLINE) for emp in data)
+
+def _write_all(fd: int, buf: bytes):
+    view = memoryview(buf)
     try:
-        with open(JSON_FILE_PATH, 'r') as f:
-            data = json.load(f)
-            return data if isinstance(data, list) else []
-    except (json.JSONDecodeError, ValueError):
-        return []
+        while view:
+            view = view[os.write(fd, view):]
+        os.fsync(fd)
+    finally:
+        view.release()
+        os.close(fd)
 
 def write_db(data: List[dict]):
-    with open(JSON_FILE_PATH, 'w') as f:
-        json.dump(data, f, indent=4)
+    """Write the table to a temp file and atomically swap it into place."""
+    global _CACHE_STAT
+    buf = _encode_lines(data)
+    _write_all(os.open(_TMP_PATH_STR, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644), buf)
+    os.replace(_TMP_PATH_STR, _PATH_STR)
+    _CACHE_STAT = _file_stat()
+
+def append_db(data: List[dict]):
+    """Append records to the end of the file without rewriting it."""
+    global _CACHE_STAT
+    buf = _encode_lines(data)
+    _write_all(os.open(_PATH_STR, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644), buf)
+    _CACHE_STAT = _file_stat()
+
+def _flush():
+    """Write the cached table to disk if it has unsaved changes."""
+    global _dirty, _needs_rewrite, _pending_writes, _flush_deadline
+    with _LOCK:
+        _flush_deadline = None
+        if not _dirty:
+            return
+        if not _needs_rewrite and _file_stat() != _CACHE_STAT:
+            # The file changed under the dirty cache; appending would splice our rows
+            # onto someone else's, so write the cached table out whole instead.
+            _needs_rewrite = True
+        if _needs_rewrite:
+            write_db(_rows())
+        else:
+            try:
+                append_db(_pending_appends)
+            except BaseException:
+                # A partial append may have left a torn line; don't append after it.
+                _needs_rewrite = True
+                raise
+        _dirty = False
+        _needs_rewrite = False
+        _pending_appends.clear()
+        _pending_writes = 0
+
+def _persist(appended: Optional[dict] = None):
+    """Mark the cache dirty and schedule a deferred flush.
+
+    Pass the new record as ``appended`` when the mutation is a pure insert.
+    """
+    global _dirty, _needs_rewrite, _pending_writes, _flush_deadline, _flusher
+    with _LOCK:
+        _invalidate_views()
+        _dirty = True
+        if appended is None:
+            _needs_rewrite = True
+        elif not _needs_rewrite:
+            _pending_appends.append(appended)
+        _pending_writes += 1
+        if _pending_writes < _FLUSH_EVERY:
+            pending = _flush_deadline is not None
+            _flush_deadline = time.monotonic() + _FLUSH_DELAY
+            if _flusher is None:
+                _flusher = threading.Thread(target=_flush_loop, name="employee-flush", daemon=True)
+                _flusher.start()
+            elif not pending:
+                _flush_wakeup.notify()
+            return
+    _flush()
+
+def _flush_loop():
+    """Body of the flusher thread: flush once the current deadline passes."""
+    with _flush_wakeup:
+        while True:
+            if _flush_deadline is None:
+                _flush_wakeup.wait()
+                continue
+            remaining = _flush_deadline - time.monotonic()
+            if remaining > 0:
+                # A later mutation may push the deadline back; re-check after waking.
+                _flush_wakeup.wait(remaining)
+                continue
+            try:
+                _flush()
+            except Exception:
+                # Changes stay dirty and are retried on the next mutation or at exit.
+                logger.exception("Failed to flush employee data to %s", _PATH_STR)
+
+def _handle_sigterm(signum, frame):
+    # Flush pending writes, then die from the signal as if no handler were installed.
+    # The flush runs on a helper thread because the signal may have interrupted a
+    # mutation that still holds _LOCK on this thread; a second SIGTERM kills at once.
+    signal.signal(signum, signal.SIG_DFL)
+    threading.Thread(target=_flush_and_kill, args=(signum,), daemon=True).start()
+
+def _flush_and_kill(signum: int):
+    try:
+        _flush()
+    finally:
+        os.kill(os.getpid(), signum)
+
+atexit.register(_flush)
 
 # --- MCP Tools ---
 
 @mcp.tool()
 def add_employee(name: str, job_role: str, department: str, salary: float) -> str:
     """Add a new employee with auto-generated ID."""
-    employees = read_db()
-    new_id = max([emp["id"] for emp in employees if isinstance(emp, dict)], default=0) + 1
-    new_employee = {
-        "id": new_id, "name": name, "job_role": job_role, 
-        "department": department, "salary": salary
-    }
-    employees.append(new_employee)
-    write_db(employees)
+    global _NEXT_ID
+    with _LOCK:
+        error = _refresh_cache()
+        if error:
+            return error
+        new_id = _NEXT_ID
+        try:
+            employee = Employee(
+                id=new_id, name=name, job_role=job_role, 
+                department=department, salary=salary
+            )
+        except ValidationError as exc:
+            return _validation_error(exc)
+        _NEXT_ID += 1
+        new_employee = employee.model_dump()
+        _append_row(new_employee)
+        _persist(appended=new_employee)
     return f"Employee added successfully with ID: {new_id}"
 
 @mcp.tool()
 def list_employees() -> str:
     """List all employees."""
-    return json.dumps(read_db(), indent=2)
+    global _LIST_JSON
+    error = _refresh_cache()
+    if error:
+        return error
+    cached = _LIST_JSON
+    if cached is None:
+        with _LOCK:
+            # Encode straight to UTF-8 bytes in one pass and decode once for the response.
+            cached = _LIST_JSON = orjson.dumps(_rows(), option=orjson.OPT_INDENT_2).decode()
+    return cached
 
 @mcp.tool()
 def get_employee(employee_id: int) -> str:
     """Retrieve employee details by ID."""
-    employees = read_db()
-    employee = next((e for e in employees if e["id"] == employee_id), None)
-    return json.dumps(employee, indent=2) if employee else f"Error: ID {employee_id} not found."
+    error = _refresh_cache()
+    if error:
+        return error
+    # A row spans several columns, so read it under the lock to avoid a torn record.
+    with _LOCK:
+        row = _ROW.get(employee_id)
+        if row is None:
+            return f"Error: ID {employee_id} not found."
+        employee = _row(row)
+    # Every cached row passed Employee validation when it was added, updated, or
+    # loaded from disk, so skip re-validating it here.
+    return Employee.model_construct(**employee).model_dump_json(indent=2)
 
 @mcp.tool()
 def update_employee(employee_id: int, name: Optional[str] = None, job_role: Optional[str] = None, 
                    department: Optional[str] = None, salary: Optional[float] = None) -> str:
     """Update employee information by ID. Only provided fields will be updated."""
-    employees = read_db()
-    employee = next((e for e in employees if e["id"] == employee_id), None)
-    
-    if not employee:
-        return f"Error: Employee with ID {employee_id} not found."
-    
-    if name is not None:
-        employee["name"] = name
-    if job_role is not None:
-        employee["job_role"] = job_role
-    if department is not None:
-        employee["department"] = department
-    if salary is not None:
-        if salary <= 0:
-            return "Error: Salary must be greater than 0."
-        employee["salary"] = salary
-    
-    write_db(employees)
+    changes = {
+        key: value for key, value in (
+            ("name", name), ("job_role", job_role),
+            ("department", department), ("salary", salary),
+        ) if value is not None
+    }
+    with _LOCK:
+        error = _refresh_cache()
+        if error:
+            return error
+        row = _ROW.get(employee_id)
+        
+        if row is None:
+            return f"Error: Employee with ID {employee_id} not found."
+        
+        if changes:
+            try:
+                employee = Employee.model_validate({**_row(row), **changes})
+            except ValidationError as exc:
+                return _validation_error(exc)
+            for key in changes:
+                value = getattr(employee, key)
+                _COLUMNS[key][row] = sys.intern(value) if key in ("job_role", "department") else value
+            _persist()
     return f"Employee {employee_id} updated successfully."
 
 @mcp.tool()
 def delete_employee(employee_id: int) -> str:
     """Delete an employee by ID."""
-    employees = read_db()
-    updated_list = [e for e in employees if e["id"] != employee_id]
-    
-    if len(updated_list) == len(employees):
-        return f"Error: Employee with ID {employee_id} not found."
-    
-    write_db(updated_list)
+    with _LOCK:
+        error = _refresh_cache()
+        if error:
+            return error
+        row = _ROW.get(employee_id)
+        if row is None:
+            return f"Error: Employee with ID {employee_id} not found."
+        
+        _delete_row(row)
+        _persist()
     return f"Employee {employee_id} deleted successfully."
 
+@mcp.tool()
+def get_salary_stats() -> str:
+    """Summarize salaries across all employees (count, total, average, min, max)."""
+    error = _refresh_cache()
+    if error:
+        return error
+    with _LOCK:
+        _compact()
+        if not _SALARIES:
+            return "Error: No employees found."
+        # Reductions run in C directly over the contiguous float64 salary column.
+        total = math.fsum(_SALARIES)
+        stats = {
+            "count": len(_SALARIES), "total": total, "average": total / len(_SALARIES),
+            "min": min(_SALARIES), "max": max(_SALARIES)
+        }
+    return orjson.dumps(stats, option=orjson.OPT_INDENT_2).decode()
+
 @mcp.resource("employees://ids")
 def get_employee_ids() -> str:
     """Get a list of all existing employee IDs."""
-    ids = [emp["id"] for emp in read_db() if isinstance(emp, dict)]
-    return f"Available Employee IDs: {ids}"
+    global _IDS_STR
+    error = _refresh_cache()
+    if error:
+        return error
+    cached = _IDS_STR
+    if cached is None:
+        with _LOCK:
+            _compact()
+            cached = _IDS_STR = f"Available Employee IDs: {_IDS.tolist()}"
+    return cached
 
 def main():
     # Ensure the directory exists before attempting to write
-    db_dir = os.path.dirname(JSON_FILE_PATH)
-    if db_dir and not os.path.exists(db_dir):
-        os.makedirs(db_dir, exist_ok=True)
+    _PATH_PARENT.mkdir(parents=True, exist_ok=True)
         
-    if not os.path.exists(JSON_FILE_PATH):
+    # The first load also migrates a legacy .json file if there is one.
+    if _refresh_cache() is None and _CACHE_STAT is None:
         write_db([])
+    signal.signal(signal.SIGTERM, _handle_sigterm)
     mcp.run()
 
 if __name__ == "__main__":